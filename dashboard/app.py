@@ -1,5 +1,5 @@
 """
-dashboard/app.py — Streamlit dashboard reading from CSV exports.
+dashboard/app.py — Streamlit dashboard reading from Parquet exports.
 Works both locally and on Streamlit Cloud.
 """
 import pandas as pd
@@ -19,33 +19,87 @@ st.markdown(
     "enriched with AI-extracted skills and seniority levels."
 )
 
-# ── Load CSV data ─────────────────────────────────────────────────────────────
+# ── Load exported data ────────────────────────────────────────────────────────
 ASSETS = Path(__file__).parent.parent / "assets"
-st.write(str(ASSETS))  # temporary debug line
-
-@st.cache_data
-def load_data():
-    try:
-        skills     = pd.read_csv(ASSETS / "skills.csv")
-        seniority  = pd.read_csv(ASSETS / "seniority.csv")
-        companies  = pd.read_csv(ASSETS / "companies.csv")
-        jobs       = pd.read_csv(ASSETS / "jobs.csv")
-        return skills, seniority, companies, jobs
-    except FileNotFoundError as e:
-        return None, None, None, None
-
-skills_df, seniority_df, companies_df, jobs_df = load_data()
-
-if skills_df is None:
-    st.error("Data files not found. Run the export script locally and push the assets/ folder to GitHub.")
-    st.code("python -c \"import duckdb; con = duckdb.connect('./data/jobs.duckdb'); con.execute('SELECT * FROM mart_top_skills_daily').df().to_csv('assets/skills.csv', index=False); con.close()\"")
+ASSET_FILES = ["skills.parquet", "seniority.parquet", "companies.parquet", "jobs.parquet"]
+JOB_COLUMNS = ["title", "company_name", "location_name", "role_family", "seniority", "posted_date"]
+
+
+def dataset_version() -> float:
+    """Newest mtime of the exported files — changes whenever the assets are re-exported."""
+    return max((p.stat().st_mtime for p in ASSETS.glob("*.parquet")), default=0.0)
+
+
+# One loader per file, each reading only the columns the page uses.
+# Every cached function takes `version`, so a fresh export invalidates the cache.
+@st.cache_data(ttl=3600)
+def load_skills(version: float) -> pd.DataFrame:
+    return pd.read_parquet(ASSETS / "skills.parquet", columns=["skill", "job_count"])
+
+
+@st.cache_data(ttl=3600)
+def load_seniority(version: float) -> pd.DataFrame:
+    return pd.read_parquet(ASSETS / "seniority.parquet", columns=["seniority", "skill", "job_count"])
+
+
+@st.cache_data(ttl=3600)
+def load_companies(version: float) -> pd.DataFrame:
+    return pd.read_parquet(ASSETS / "companies.parquet", columns=["company_name", "job_count"])
+
+
+@st.cache_data(ttl=3600)
+def load_jobs(version: float) -> pd.DataFrame:
+    return pd.read_parquet(ASSETS / "jobs.parquet", columns=JOB_COLUMNS)
+
+
+@st.cache_data(ttl=3600)
+def load_kpis(version: float) -> tuple[int, int, int, int]:
+    """All four KPI values in one cached pass: jobs, companies, skills, enriched jobs."""
+    jobs = load_jobs(version)
+    return (
+        len(jobs),
+        int(load_companies(version)["company_name"].nunique()),
+        int(load_skills(version)["skill"].nunique()),
+        int((jobs["role_family"] != "unknown").sum()),
+    )
+
+
+@st.cache_data(ttl=3600)
+def load_top_skills(version: float, limit: int = 25) -> pd.DataFrame:
+    return (
+        load_skills(version)
+        .groupby("skill")["job_count"]
+        .sum()
+        .sort_values(ascending=False)
+        .head(limit)
+        .reset_index()
+    )
+
+
+@st.cache_data(ttl=3600)
+def load_seniority_levels(version: float) -> list[str]:
+    return sorted(load_seniority(version)["seniority"].unique().tolist())
+
+
+@st.cache_data(ttl=3600)
+def load_skills_for_level(version: float, level: str, limit: int = 20) -> pd.DataFrame:
+    seniority = load_seniority(version)
+    return (
+        seniority[seniority["seniority"] == level]
+        .sort_values("job_count", ascending=False)
+        .head(limit)
+    )
+
+
+if not all((ASSETS / f).exists() for f in ASSET_FILES):
+    st.error("Data files not found. Run the pipeline locally (it exports assets/*.parquet) and push the assets/ folder to GitHub.")
+    st.code("python -m src.pipeline.run")
     st.stop()
 
+version = dataset_version()
+
 # ── KPI row ───────────────────────────────────────────────────────────────────
-total_jobs      = len(jobs_df)
-total_companies = companies_df["company_name"].nunique() if companies_df is not None else 0
-total_skills    = skills_df["skill"].nunique() if skills_df is not None else 0
-enriched        = len(jobs_df[jobs_df["role_family"] != "unknown"]) if jobs_df is not None else 0
+total_jobs, total_companies, total_skills, enriched = load_kpis(version)
 
 col1, col2, col3, col4 = st.columns(4)
 col1.metric("Total Jobs",       total_jobs)
@@ -59,13 +113,7 @@ st.divider()
 st.header("🔧 Top In-Demand Skills")
 st.caption("Skills most frequently mentioned in job postings (AI-extracted)")
 
-top_skills = (
-    skills_df.groupby("skill")["job_count"]
-    .sum()
-    .sort_values(ascending=False)
-    .head(25)
-    .reset_index()
-)
+top_skills = load_top_skills(version)
 st.bar_chart(top_skills.set_index("skill")["job_count"])
 
 st.divider()
@@ -73,14 +121,10 @@ st.divider()
 # ── Skills by Seniority ───────────────────────────────────────────────────────
 st.header("👤 Skills by Seniority Level")
 
-if not seniority_df.empty:
-    levels = sorted(seniority_df["seniority"].unique().tolist())
+levels = load_seniority_levels(version)
+if levels:
     selected = st.selectbox("Select seniority level", levels)
-    filtered = (
-        seniority_df[seniority_df["seniority"] == selected]
-        .sort_values("job_count", ascending=False)
-        .head(20)
-    )
+    filtered = load_skills_for_level(version, selected)
     if not filtered.empty:
         st.bar_chart(filtered.set_index("skill")["job_count"])
     else:
@@ -91,7 +135,7 @@ st.divider()
 # ── Top Companies ─────────────────────────────────────────────────────────────
 st.header("🏢 Most Active Hiring Companies")
 
-top_cos = companies_df.sort_values("job_count", ascending=False).head(20)
+top_cos = load_companies(version).sort_values("job_count", ascending=False).head(20)
 st.bar_chart(top_cos.set_index("company_name")["job_count"])
 
 st.divider()
@@ -99,9 +143,7 @@ st.divider()
 # ── Latest Jobs ───────────────────────────────────────────────────────────────
 st.header("📋 Latest Job Postings")
 
-display_cols = ["title", "company_name", "location_name", "role_family", "seniority", "posted_date"]
-available = [c for c in display_cols if c in jobs_df.columns]
-st.dataframe(jobs_df[available].head(50), use_container_width=True, hide_index=True)
+st.dataframe(load_jobs(version).head(50), use_container_width=True, hide_index=True)
 
 st.divider()
 st.caption("Built with Python · DuckDB · Ollama · Streamlit | Data from Remotive & RemoteOK APIs")
@@ -7,25 +7,44 @@ What it extracts:
   - skills      : list of lowercase skills, e.g. ["python", "sql", "airflow", "dbt"]
 
 Key features:
-  - CACHING: We check description_hash before calling the LLM.
-    If a job was already enriched (same description), we skip the LLM call.
+  - CACHING: Validated LLM output is stored in ai_extraction_cache, keyed on
+    description_hash. Before calling the LLM we look the hash up there —
+    if the same description was already extracted, we skip the LLM call.
+    Jobs in one run that share a description are sent to the LLM only once.
     This saves time and avoids re-processing on every pipeline run.
 
+  - BATCHING + CONCURRENCY: Each prompt carries OLLAMA_BATCH_SIZE postings,
+    so the fixed instructions are processed once per batch instead of once
+    per job. LLM calls are I/O-bound, so they run in a small thread pool
+    (OLLAMA_WORKERS) over one keep-alive HTTP session. DB writes stay on the
+    main thread because a DuckDB connection shouldn't be shared for writes.
+
   - FALLBACK: If Ollama isn't running or returns bad output,
     we fall back to a simple keyword-matching extractor.
-    The pipeline never crashes because of AI errors.
+    The pipeline never crashes because of AI errors. Ollama is pinged once
+    per run, and after OLLAMA_MAX_FAILURES consecutive failures the LLM is
+    skipped for the rest of the run instead of timing out job after job.
 
   - VALIDATION: We use Pydantic to validate the JSON the LLM returns.
     If the LLM returns garbage, validation catches it and we use the fallback.
 """
 import json
-import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import chain
 
+import ahocorasick
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from pydantic import BaseModel, Field
 from typing import Literal
 
-from .config import OLLAMA_URL, OLLAMA_MODEL, USE_OLLAMA
+from .config import (
+    OLLAMA_URL, OLLAMA_MODEL, OLLAMA_WORKERS, OLLAMA_BATCH_SIZE, OLLAMA_NUM_CTX,
+    OLLAMA_MAX_FAILURES, USE_OLLAMA,
+)
 from .db import connect
 from .normalize import role_id
 from .logger import get_logger
@@ -71,144 +90,537 @@ DE_KEYWORDS = [
     "dbt", "airflow", "spark", "kafka", "data platform", "data infrastructure",
 ]
 
+# Checked in order — the first family with a matching keyword wins
+ROLE_FAMILY_KEYWORDS = {
+    "data_engineering": DE_KEYWORDS,
+    "data_science":     ["data scientist", "machine learning"],
+    "analytics":        ["analytics", "analyst"],
+    "software":         ["software engineer", "backend"],
+}
+
 
 # ── Ollama LLM call ───────────────────────────────────────────────────────────
 
-PROMPT_TEMPLATE = """You are a data extraction assistant. Read the job posting below and return ONLY a JSON object — no extra text, no markdown, no explanation.
+PROMPT_TEMPLATE = """You are a data extraction assistant. Read the job postings below and return ONLY a JSON object — no extra text, no markdown, no explanation.
 
-The JSON must have exactly these keys:
+The JSON must have exactly one key, "jobs": an array with one entry per posting. Each entry must have exactly these keys:
+- "id": the posting's id, copied from the input
 - "seniority": one of ["intern", "junior", "mid", "senior", "staff", "lead", "principal", "unknown"]
 - "role_family": one of ["data_engineering", "data_science", "analytics", "ml_engineering", "software", "unknown"]
 - "skills": array of lowercase skill names like ["python", "sql", "airflow", "dbt", "spark", "aws"]
 
-Job Title: {title}
-Job Description (first 4000 chars):
-{description}
+Job postings as JSON (descriptions are the first 4000 chars):
+{postings}
 
 Respond with ONLY the JSON object:"""
 
+# One session for the whole run — reuses keep-alive connections to Ollama
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_maxsize=OLLAMA_WORKERS))
+_session.mount("https://", HTTPAdapter(pool_maxsize=OLLAMA_WORKERS))
+
+
+def _ping_ollama() -> bool:
+    """Cheap health check (GET /api/tags) so a dead server costs 2s once, not a timeout per job."""
+    tags_url = OLLAMA_URL.replace("/api/generate", "/api/tags")
+    try:
+        _session.get(tags_url, timeout=2).raise_for_status()
+        return True
+    except Exception as e:
+        log.warning("Ollama not reachable at %s (%s) — using keyword fallback for this run", tags_url, e)
+        return False
 
-def _call_ollama(title: str, description: str) -> dict:
-    """Send the job to Ollama and get back a JSON dict."""
-    prompt = PROMPT_TEMPLATE.format(
-        title=title or "",
-        description=(description or "")[:4000]
-    )
-    response = requests.post(
-        OLLAMA_URL,
-        json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False},
-        timeout=120
-    )
-    response.raise_for_status()
-    raw_text = response.json().get("response", "").strip()
 
-    # Strip any accidental markdown code fences the LLM might add
-    raw_text = re.sub(r"```(?:json)?", "", raw_text).strip().rstrip("`").strip()
+class _CircuitBreaker:
+    """
+    Stops LLM calls after `threshold` consecutive failures.
+    Shared by the worker threads, so state changes happen under a lock.
+    """
 
-    return json.loads(raw_text)
+    def __init__(self, threshold: int, tripped: bool = False):
+        self.threshold = threshold
+        self.tripped = tripped
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.failures >= self.threshold and not self.tripped:
+                self.tripped = True
+                log.warning("Ollama failed %d times in a row — using keyword fallback for the rest of the run",
+                            self.failures)
+
+
+def _call_ollama(postings: list[tuple[str, str]]) -> list[dict | None]:
+    """
+    Send a batch of (title, description) postings to Ollama in one prompt.
+    Returns one raw dict per posting, in input order — None for any posting
+    the model left out of its answer. Raises ValueError if it left out all of them.
+    """
+    prompt = PROMPT_TEMPLATE.format(postings=json.dumps(
+        [
+            {"id": i, "title": title or "", "description": (description or "")[:4000]}
+            for i, (title, description) in enumerate(postings)
+        ],
+        ensure_ascii=False,
+    ))
+    # format=json constrains decoding to valid JSON; num_predict caps runaway
+    # output (each answer is small). Streaming lets us stop reading — and
+    # close the request — as soon as the object is complete.
+    with _session.post(
+        OLLAMA_URL,
+        json={
+            "model": OLLAMA_MODEL,
+            "prompt": prompt,
+            "stream": True,
+            "format": "json",
+            "options": {"num_predict": 512 * len(postings), "num_ctx": OLLAMA_NUM_CTX},
+        },
+        timeout=120,
+        stream=True,
+    ) as response:
+        response.raise_for_status()
+        answer = _read_json_stream(response.iter_lines())
+
+    by_id = {}
+    for entry in answer.get("jobs", []):
+        try:
+            by_id[int(entry["id"])] = entry
+        except (TypeError, KeyError, ValueError):
+            continue  # malformed entry — that posting falls back
+    answers = [by_id.get(i) for i in range(len(postings))]
+
+    # An answer that ignored the batch schema (e.g. a bare {"seniority": ...})
+    # is a failed call, so the circuit breaker sees it
+    missing = answers.count(None)
+    if missing == len(postings):
+        raise ValueError(f"LLM answer has no usable entry for any of {len(postings)} posting(s)")
+    if missing:
+        log.warning("LLM answer left out %d of %d posting(s) — using fallback for those",
+                    missing, len(postings))
+    return answers
+
+
+def _read_json_stream(lines) -> dict:
+    """
+    Accumulate the "response" text from Ollama's streamed NDJSON lines and
+    return as soon as it parses as a complete JSON object.
+    Raises ValueError straight away if the output doesn't start with "{".
+    """
+    buffer = ""
+    for line in lines:
+        if not line:
+            continue
+        chunk = json.loads(line)
+        piece = chunk.get("response", "")
+        buffer += piece
+
+        head = buffer.lstrip()
+        if head and not head.startswith("{"):
+            raise ValueError(f"LLM output is not a JSON object: {head[:40]!r}")
+        if "}" in piece:
+            try:
+                return json.loads(buffer)
+            except json.JSONDecodeError:
+                pass  # a nested object closed, not the outer one — keep reading
+        if chunk.get("done"):
+            break
+    return json.loads(buffer)
 
 
 # ── Rule-based fallback ───────────────────────────────────────────────────────
+# Skills, seniority and role-family keywords all live in one Aho-Corasick
+# automaton, so each text is scanned once for every keyword instead of once
+# per keyword. Each word maps to its tags: ("skill", name), ("seniority",
+# level) or ("role", family) — a word like "spark" can carry several.
+
+def _keyword_tags() -> dict[str, list[tuple[str, str]]]:
+    tags: dict[str, list[tuple[str, str]]] = {}
+    for skill in COMMON_SKILLS:
+        tags.setdefault(skill, []).append(("skill", skill))
+    for level, keywords in SENIORITY_KEYWORDS.items():
+        for kw in keywords:
+            tags.setdefault(kw, []).append(("seniority", level))
+    for family, keywords in ROLE_FAMILY_KEYWORDS.items():
+        for kw in keywords:
+            tags.setdefault(kw, []).append(("role", family))
+    return tags
+
+
+def _build_automaton(tags: dict[str, list[tuple[str, str]]]) -> ahocorasick.Automaton:
+    automaton = ahocorasick.Automaton()
+    for word, word_tags in tags.items():
+        automaton.add_word(word, (len(word), tuple(word_tags)))
+    automaton.make_automaton()
+    return automaton
+
+_KEYWORD_AUTOMATON = _build_automaton(_keyword_tags())
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _scan_keywords(text: str) -> tuple[set[str], set[str], set[str]]:
+    """
+    One pass over text. Returns the (skills, seniority levels, role families)
+    that matched. Skills must be whole words; the category keywords are plain
+    substring matches, same as the SQL fallback's contains().
+    """
+    found = {"skill": set(), "seniority": set(), "role": set()}
+    for end, (length, word_tags) in _KEYWORD_AUTOMATON.iter(text):
+        start = end - length + 1
+        whole_word = not (
+            (start > 0 and _is_word_char(text[start - 1]))
+            or (end + 1 < len(text) and _is_word_char(text[end + 1]))
+        )
+        for kind, label in word_tags:
+            if kind != "skill" or whole_word:
+                found[kind].add(label)
+    return found["skill"], found["seniority"], found["role"]
+
 
 def _fallback_extract(title: str, description: str) -> dict:
     """Simple keyword matching — used when Ollama is unavailable or fails."""
-    text = ((title or "") + " " + (description or "")).lower()
+    seniority, role_family, skills = _fallback_extract_cached(title or "", description or "")
+    return {"seniority": seniority, "role_family": role_family, "skills": list(skills)}
 
-    # Detect skills
-    skills = [s for s in COMMON_SKILLS if re.search(rf"\b{re.escape(s)}\b", text)]
 
-    # Detect seniority
-    seniority = "unknown"
-    for level, keywords in SENIORITY_KEYWORDS.items():
-        if any(kw in text for kw in keywords):
-            seniority = level
-            break
+# This path only runs for jobs the LLM failed on mid-run (whole-run fallback is
+# _fallback_enrich_sql), so the cache is sized for that, not for every job —
+# each entry pins its full description string in memory.
+FALLBACK_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=FALLBACK_CACHE_SIZE)
+def _fallback_extract_cached(title: str, description: str) -> tuple[str, str, tuple[str, ...]]:
+    """
+    Memoized core of _fallback_extract. Job boards repost the same description
+    many times, so identical (title, description) pairs are only scanned once.
+    Returns an immutable tuple so cached results can't be mutated by callers.
+    """
+    text = (title + " " + description).lower()
+    skills, levels, families = _scan_keywords(text)
+
+    # Priority follows the keyword dicts' order, not position in the text
+    seniority   = next((level for level in SENIORITY_KEYWORDS if level in levels), "unknown")
+    role_family = next((family for family in ROLE_FAMILY_KEYWORDS if family in families), "unknown")
+
+    return seniority, role_family, tuple(s for s in COMMON_SKILLS if s in skills)
+
+
+# ── Set-based fallback (whole run without the LLM) ────────────────────────────
+# The same rules as _fallback_extract, expressed as SQL over all pending jobs
+# at once, so DuckDB's vectorized string kernels do the matching instead of a
+# Python loop. Generated from the same keyword lists, so the two can't drift.
 
-    # Detect role family
-    role_family = "unknown"
-    if any(kw in text for kw in DE_KEYWORDS):
-        role_family = "data_engineering"
-    elif "data scientist" in text or "machine learning" in text:
-        role_family = "data_science"
-    elif "analytics" in text or "analyst" in text:
-        role_family = "analytics"
-    elif "software engineer" in text or "backend" in text:
-        role_family = "software"
+def _sql_str(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
 
-    return {"seniority": seniority, "role_family": role_family, "skills": skills}
+
+def _keyword_case(rules: dict[str, list[str]], column: str = "text") -> str:
+    """CASE expression returning the first label whose keywords occur in column."""
+    whens = []
+    for label, keywords in rules.items():
+        cond = " OR ".join(f"contains({column}, {_sql_str(kw)})" for kw in keywords)
+        whens.append(f"WHEN {cond} THEN {_sql_str(label)}")
+    return "CASE " + " ".join(whens) + " ELSE 'unknown' END"
+
+
+def _fallback_enrich_sql(con) -> int:
+    """
+    Keyword-extract every pending job that has no cached LLM result, in a
+    handful of set-based statements. Returns the number of jobs processed.
+    """
+    skills_df = pd.DataFrame({"skill": COMMON_SKILLS})
+    con.register("fallback_skills_df", skills_df)
+    con.begin()
+    try:
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE _fallback_jobs AS
+            SELECT job_id, text,
+                   {_keyword_case(ROLE_FAMILY_KEYWORDS)} AS role_family,
+                   {_keyword_case(SENIORITY_KEYWORDS)}   AS seniority
+            FROM (
+                SELECT f.job_id,
+                       lower(COALESCE(f.title, '') || ' ' || COALESCE(f.description, '')) AS text
+                FROM fact_job_posting f
+                WHERE NOT EXISTS (SELECT 1 FROM bridge_job_skill b WHERE b.job_id = f.job_id)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM ai_extraction_cache c WHERE c.description_hash = f.description_hash
+                  )
+            )
+        """)
+        processed = con.execute("SELECT COUNT(*) FROM _fallback_jobs").fetchone()[0]
+
+        # Role IDs come from role_id() so they always match the Python path
+        combos = con.execute("SELECT DISTINCT role_family, seniority FROM _fallback_jobs").fetchall()
+        roles_df = pd.DataFrame(
+            [(role_id(family, level), family, level) for family, level in combos],
+            columns=["role_id", "role_family", "seniority"],
+        )
+        con.register("fallback_roles_df", roles_df)
+        con.execute("""
+            INSERT OR IGNORE INTO dim_role (role_id, role_family, seniority)
+            SELECT role_id, role_family, seniority FROM fallback_roles_df
+        """)
+        con.execute("""
+            UPDATE fact_job_posting f
+            SET role_id = r.role_id
+            FROM _fallback_jobs j
+            JOIN fallback_roles_df r USING (role_family, seniority)
+            WHERE f.job_id = j.job_id
+        """)
+        con.execute("""
+            INSERT OR IGNORE INTO bridge_job_skill (job_id, skill)
+            SELECT j.job_id, s.skill
+            FROM _fallback_jobs j
+            JOIN fallback_skills_df s
+              ON regexp_matches(j.text, '\\b' || regexp_escape(s.skill) || '\\b')
+        """)
+        con.execute("DROP TABLE _fallback_jobs")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.unregister("fallback_skills_df")
+        con.unregister("fallback_roles_df")
+    return processed
+
+
+# ── Per-job extraction (runs in worker threads) ───────────────────────────────
+
+def _extract_chunk(chunk: list[tuple], breaker: _CircuitBreaker) -> list[tuple[str, str, dict, str]]:
+    """
+    Extract a chunk of jobs: cache first, then one batched LLM call for the
+    rest, keyword fallback for any job the LLM fails on.
+    Runs in worker threads — no DB access here.
+    Returns (job_id, description_hash, raw_dict, source) per job, in order,
+    where source is "cache", "llm" or "fallback".
+    """
+    results = {}
+    pending = []
+    for job in chunk:
+        job_id_val, _, _, desc_hash, cached_json = job
+        if cached_json is not None:
+            results[job_id_val] = (job_id_val, desc_hash, json.loads(cached_json), "cache")
+        else:
+            pending.append(job)
+
+    if pending and not breaker.tripped:
+        try:
+            answers = _call_ollama([(title, description) for _, title, description, _, _ in pending])
+            breaker.record(ok=True)
+        except Exception as e:
+            answers = [None] * len(pending)
+            breaker.record(ok=False)
+            log.warning("Ollama failed for %d job(s): %s — using fallback", len(pending), e)
+
+        # Validate each answer on its own so one bad entry doesn't sink the batch
+        for job, raw in zip(pending, answers):
+            if raw is None:
+                continue
+            try:
+                Extraction(**raw)
+            except Exception:
+                continue
+            results[job[0]] = (job[0], job[3], raw, "llm")
+
+    for job_id_val, title, description, desc_hash, _ in pending:
+        if job_id_val not in results:
+            results[job_id_val] = (job_id_val, desc_hash, _fallback_extract(title, description), "fallback")
+
+    return [results[job[0]] for job in chunk]
+
+
+def _with_repeats(results, repeats: dict[str, list[tuple]]):
+    """
+    Yield each extraction result, followed by one for every other pending job
+    that shares its description_hash. Those jobs reuse the LLM answer, the same
+    way a later run would reuse it from the cache. Fallback results depend on
+    the title too, so a repeat whose original fell back gets its own fallback.
+    """
+    for result in results:
+        yield result
+        _, desc_hash, raw, source = result
+        for job_id_val, title, description, _, _ in repeats.get(desc_hash, ()):
+            if source == "llm":
+                yield job_id_val, desc_hash, raw, "llm"
+            else:
+                yield job_id_val, desc_hash, _fallback_extract(title, description), "fallback"
+
+
+# ── Warehouse writes ──────────────────────────────────────────────────────────
+
+WRITE_BATCH_SIZE = 200   # jobs per write transaction
+
+
+def _write_batch(
+    con,
+    batch: list[tuple[str, Extraction]],
+    cache_rows: list[tuple[str, str]],
+) -> None:
+    """
+    Write a batch of (job_id, Extraction) results in one transaction.
+    Roles and skills go in as registered DataFrames, so a batch costs a
+    handful of statements instead of one per skill.
+    cache_rows are (description_hash, payload_json) pairs for new LLM results.
+    """
+    roles_df = pd.DataFrame(
+        [(j_id, role_id(d.role_family, d.seniority), d.role_family, d.seniority)
+         for j_id, d in batch],
+        columns=["job_id", "role_id", "role_family", "seniority"],
+    )
+    # Deduplicate skills per job
+    skills_df = pd.DataFrame(
+        [(j_id, skill)
+         for j_id, d in batch
+         for skill in sorted(set(s.strip().lower() for s in d.skills if s.strip()))],
+        columns=["job_id", "skill"],
+    )
+    cache_df = pd.DataFrame(cache_rows, columns=["description_hash", "payload_json"])
+
+    con.register("roles_df", roles_df)
+    con.register("skills_df", skills_df)
+    con.register("cache_df", cache_df)
+    con.begin()
+    try:
+        con.execute("""
+            INSERT OR IGNORE INTO dim_role (role_id, role_family, seniority)
+            SELECT DISTINCT role_id, role_family, seniority FROM roles_df
+        """)
+        con.execute("""
+            UPDATE fact_job_posting f
+            SET role_id = r.role_id
+            FROM roles_df r
+            WHERE f.job_id = r.job_id
+        """)
+        con.execute("INSERT OR IGNORE INTO bridge_job_skill (job_id, skill) SELECT job_id, skill FROM skills_df")
+        con.execute("""
+            INSERT OR IGNORE INTO ai_extraction_cache (description_hash, payload_json, cached_at)
+            SELECT description_hash, payload_json, now() FROM cache_df
+        """)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.unregister("roles_df")
+        con.unregister("skills_df")
+        con.unregister("cache_df")
 
 
 # ── Main enrichment runner ────────────────────────────────────────────────────
 
-def run_ai_enrichment() -> dict:
+def run_ai_enrichment(con=None) -> dict:
     """
     For every job in fact_job_posting that hasn't been enriched yet,
     run AI extraction and write results to bridge_job_skill + update dim_role.
+    Writes are buffered and flushed every WRITE_BATCH_SIZE jobs. When the LLM
+    is off for the whole run, the keyword fallback runs set-wise in SQL.
     """
-    con = connect()
-
-    # Get jobs that have no skills yet (not yet enriched)
-    jobs = con.execute("""
-        SELECT f.job_id, f.title, f.description, f.description_hash
+    own_con = con is None
+    if own_con:
+        con = connect()
+    use_llm = USE_OLLAMA and _ping_ollama()
+
+    # Get jobs that have no skills yet (not yet enriched), plus any cached
+    # extraction for the same description. Without the LLM only cache hits
+    # go through the per-job loop — the rest is handled by _fallback_enrich_sql.
+    # Cache hits sort first so the uncached jobs form full LLM batches.
+    cache_join = "LEFT JOIN" if use_llm else "JOIN"
+    jobs = con.execute(f"""
+        SELECT f.job_id, f.title, f.description, f.description_hash, c.payload_json
         FROM fact_job_posting f
+        {cache_join} ai_extraction_cache c ON c.description_hash = f.description_hash
         WHERE NOT EXISTS (
             SELECT 1 FROM bridge_job_skill b WHERE b.job_id = f.job_id
         )
+        ORDER BY c.payload_json IS NULL
     """).fetchall()
 
     log.info("AI enrichment — %d jobs to process", len(jobs))
 
     enriched   = 0
+    used_cache = 0
     used_llm   = 0
     used_fallback = 0
-
-    for job_id_val, title, description, desc_hash in jobs:
-        # Try the LLM first, fall back on any error
-        raw = None
-        if USE_OLLAMA:
-            try:
-                raw = _call_ollama(title, description)
-                used_llm += 1
-            except Exception as e:
-                log.warning("Ollama failed for job %s: %s — using fallback", job_id_val, e)
-
-        if raw is None:
-            raw = _fallback_extract(title, description)
-            used_fallback += 1
-
-        # Validate with Pydantic — coerces bad values to defaults
-        try:
-            data = Extraction(**raw)
-        except Exception:
-            data = Extraction()  # empty/default if validation fails entirely
-
-        # Update dim_role
-        r_id = role_id(data.role_family, data.seniority)
-        con.execute(
-            "INSERT OR IGNORE INTO dim_role (role_id, role_family, seniority) VALUES (?, ?, ?)",
-            [r_id, data.role_family, data.seniority]
-        )
-        con.execute(
-            "UPDATE fact_job_posting SET role_id = ? WHERE job_id = ?",
-            [r_id, job_id_val]
+    batch: list[tuple[str, Extraction]] = []
+    cache_rows: list[tuple[str, str]] = []
+
+    breaker = _CircuitBreaker(OLLAMA_MAX_FAILURES, tripped=not use_llm)
+
+    # Fallback-only runs are CPU-bound, so threads wouldn't help there
+    workers = OLLAMA_WORKERS if use_llm else 1
+
+    # Job boards repost descriptions, so only the first uncached job per
+    # description_hash is extracted; the others are fanned out from its result
+    unique_jobs: list[tuple] = []
+    repeats: dict[str, list[tuple]] = {}
+    for job in jobs:
+        desc_hash, cached_json = job[3], job[4]
+        if cached_json is None and desc_hash in repeats:
+            repeats[desc_hash].append(job)
+            continue
+        if cached_json is None:
+            repeats[desc_hash] = []
+        unique_jobs.append(job)
+
+    chunks = [unique_jobs[i:i + OLLAMA_BATCH_SIZE] for i in range(0, len(unique_jobs), OLLAMA_BATCH_SIZE)]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = _with_repeats(
+            chain.from_iterable(pool.map(partial(_extract_chunk, breaker=breaker), chunks)), repeats,
         )
-
-        # Insert skills (deduplicated)
-        clean_skills = sorted(set(s.strip().lower() for s in data.skills if s.strip()))
-        for skill in clean_skills:
-            con.execute(
-                "INSERT INTO bridge_job_skill (job_id, skill) VALUES (?, ?)",
-                [job_id_val, skill]
-            )
-
-        enriched += 1
-
-        if enriched % 20 == 0:
-            log.info("  ... enriched %d / %d jobs", enriched, len(jobs))
-
-    con.close()
+        try:
+            for job_id_val, desc_hash, raw, source in results:
+                if source == "cache":
+                    used_cache += 1
+                elif source == "llm":
+                    used_llm += 1
+                else:
+                    used_fallback += 1
+
+                # Validate with Pydantic — coerces bad values to defaults
+                try:
+                    data = Extraction(**raw)
+                except Exception:
+                    data = Extraction()  # empty/default if validation fails entirely
+
+                batch.append((job_id_val, data))
+                if source == "llm":
+                    cache_rows.append((desc_hash, data.model_dump_json()))
+                enriched += 1
+
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    _write_batch(con, batch, cache_rows)
+                    batch, cache_rows = [], []
+                    log.info("  ... enriched %d / %d jobs", enriched, len(jobs))
+        except BaseException:
+            # pool.map queued every chunk up front; cancel what hasn't started,
+            # or the with-exit would wait for the whole backlog of LLM calls
+            # before a write error or Ctrl-C got through
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    if batch:
+        _write_batch(con, batch, cache_rows)
+
+    if not use_llm:
+        sql_fallback = _fallback_enrich_sql(con)
+        log.info("  ... keyword fallback applied to %d jobs in SQL", sql_fallback)
+        enriched      += sql_fallback
+        used_fallback += sql_fallback
+
+    if own_con:
+        con.close()
     log.info(
-        "AI enrichment complete — %d enriched (%d via LLM, %d via fallback)",
-        enriched, used_llm, used_fallback
+        "AI enrichment complete — %d enriched (%d from cache, %d via LLM, %d via fallback)",
+        enriched, used_cache, used_llm, used_fallback
     )
-    return {"enriched": enriched, "llm": used_llm, "fallback": used_fallback}
+    return {"enriched": enriched, "cache": used_cache, "llm": used_llm, "fallback": used_fallback}
@@ -8,7 +8,14 @@ from dotenv import load_dotenv
 # Load variables from .env into the environment
 load_dotenv()
 
-DUCKDB_PATH   = os.getenv("DUCKDB_PATH", "./data/jobs.duckdb")
-USE_OLLAMA    = os.getenv("USE_OLLAMA", "true").lower() == "true"
-OLLAMA_MODEL  = os.getenv("OLLAMA_MODEL", "llama3.1")
-OLLAMA_URL    = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+DUCKDB_PATH         = os.getenv("DUCKDB_PATH", "./data/jobs.duckdb")
+DUCKDB_THREADS      = int(os.getenv("DUCKDB_THREADS", "0"))       # 0 = DuckDB default
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT", "")        # e.g. "4GB"
+ASSETS_DIR          = os.getenv("ASSETS_DIR", "./assets")         # Parquet exports read by the dashboard
+USE_OLLAMA          = os.getenv("USE_OLLAMA", "true").lower() == "true"
+OLLAMA_MODEL        = os.getenv("OLLAMA_MODEL", "llama3.1")
+OLLAMA_URL          = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+OLLAMA_WORKERS      = int(os.getenv("OLLAMA_WORKERS", "4"))       # concurrent LLM requests
+OLLAMA_BATCH_SIZE   = int(os.getenv("OLLAMA_BATCH_SIZE", "4"))    # job postings per prompt
+OLLAMA_NUM_CTX      = int(os.getenv("OLLAMA_NUM_CTX", "8192"))    # context window; must fit a whole batch
+OLLAMA_MAX_FAILURES = int(os.getenv("OLLAMA_MAX_FAILURES", "5"))  # consecutive failures before giving up on the LLM
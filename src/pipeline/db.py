@@ -5,7 +5,7 @@ DuckDB is a file-based database (like SQLite but much faster for analytics).
 No server needed — it's just a file: data/jobs.duckdb
 """
 import duckdb
-from .config import DUCKDB_PATH
+from .config import DUCKDB_PATH, DUCKDB_MEMORY_LIMIT, DUCKDB_THREADS
 from .logger import get_logger
 
 log = get_logger(__name__)
@@ -13,10 +13,16 @@ log = get_logger(__name__)
 
 def connect() -> duckdb.DuckDBPyConnection:
     """Open a connection to the warehouse file."""
-    return duckdb.connect(DUCKDB_PATH)
+    config = {}
+    # Unset = DuckDB defaults (all cores, 80% of RAM)
+    if DUCKDB_THREADS:
+        config["threads"] = DUCKDB_THREADS
+    if DUCKDB_MEMORY_LIMIT:
+        config["memory_limit"] = DUCKDB_MEMORY_LIMIT
+    return duckdb.connect(DUCKDB_PATH, config=config)
 
 
-def init_db():
+def init_db(con: duckdb.DuckDBPyConnection | None = None):
     """
     Create all tables if they don't already exist.
     Safe to run multiple times — existing data is never deleted.
@@ -24,20 +30,31 @@ def init_db():
     Table layers:
       RAW    — Original JSON payloads from the API (nothing removed)
       SILVER — Cleaned, structured, relational tables
-      GOLD   — Pre-aggregated analytics tables (marts)
+      GOLD   — Pre-aggregated analytics tables (marts), created by build_marts
+
+    Like every pipeline stage, it uses `con` when given (the caller owns and
+    closes it) and otherwise opens and closes its own connection.
     """
     log.info("Initialising database at %s", DUCKDB_PATH)
-    con = connect()
+    own_con = con is None
+    if own_con:
+        con = connect()
 
     # ── RAW LAYER ─────────────────────────────────────────────────────────────
     con.execute("""
         CREATE TABLE IF NOT EXISTS raw_job_postings (
             source         VARCHAR,   -- e.g. 'remotive' or 'remoteok'
             source_job_id  VARCHAR,   -- ID from the source API
-            payload_json   VARCHAR,   -- full original JSON as a string
+            payload_json   JSON,      -- full original JSON (validated on insert)
             ingested_at    TIMESTAMP  -- when we pulled this
         );
     """)
+    # Idempotency key for ingest (INSERT ... ON CONFLICT DO NOTHING).
+    # An index rather than a table constraint so existing warehouses get it too.
+    con.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_raw_source_job
+        ON raw_job_postings (source, source_job_id);
+    """)
 
     # ── SILVER LAYER — dimension tables ───────────────────────────────────────
     con.execute("""
@@ -88,30 +105,22 @@ def init_db():
             skill  VARCHAR
         );
     """)
-
-    # ── GOLD LAYER — pre-built analytics marts ────────────────────────────────
+    # At most one row per (job, skill), so marts can COUNT(*) instead of
+    # COUNT(DISTINCT job_id). Inserts use INSERT OR IGNORE against it.
     con.execute("""
-        CREATE TABLE IF NOT EXISTS mart_top_skills_daily (
-            date      DATE,
-            skill     VARCHAR,
-            job_count INTEGER
-        );
-    """)
-
-    con.execute("""
-        CREATE TABLE IF NOT EXISTS mart_skill_by_seniority (
-            seniority VARCHAR,
-            skill     VARCHAR,
-            job_count INTEGER
-        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_bridge_job_skill
+        ON bridge_job_skill (job_id, skill);
     """)
 
+    # ── AI CACHE — validated LLM output per unique description ───────────────
     con.execute("""
-        CREATE TABLE IF NOT EXISTS mart_top_companies (
-            company_name VARCHAR,
-            job_count    INTEGER
+        CREATE TABLE IF NOT EXISTS ai_extraction_cache (
+            description_hash VARCHAR PRIMARY KEY,  -- same key as fact_job_posting
+            payload_json     VARCHAR,              -- validated Extraction as JSON
+            cached_at        TIMESTAMP
         );
     """)
 
-    con.close()
+    if own_con:
+        con.close()
     log.info("Database ready — all tables created (or already existed).")
@@ -7,11 +7,13 @@ Sources used (both free, no API key required):
 
 Key concept — IDEMPOTENCY:
   Running the pipeline twice won't create duplicate rows.
-  We check if (source + source_job_id) already exists before inserting.
+  (source + source_job_id) has a unique index, and each source is loaded with
+  one bulk INSERT ... ON CONFLICT DO NOTHING, so existing rows are skipped.
 """
 import json
 import datetime as dt
 
+import pandas as pd
 import requests
 
 from .db import connect
@@ -59,60 +61,56 @@ def fetch_remoteok() -> list[dict]:
 
 # ── Storage ───────────────────────────────────────────────────────────────────
 
-def upsert_raw(source: str, source_job_id: str, payload: dict) -> bool:
+def upsert_raw(con, source: str, jobs: list[dict]) -> tuple[int, int]:
     """
-    Insert a raw job into the database — but only if it doesn't already exist.
-    Returns True if a new row was inserted, False if it was a duplicate.
+    Bulk-insert one source's jobs into the raw layer in a single statement.
+    Jobs that already exist (same source + source_job_id) are skipped.
+    Returns (inserted, skipped).
     """
-    con = connect()
-    try:
-        # Check for existing row (idempotency guard)
-        exists = con.execute(
-            "SELECT 1 FROM raw_job_postings WHERE source = ? AND source_job_id = ? LIMIT 1",
-            [source, source_job_id]
-        ).fetchone()
-
-        if exists:
-            return False  # Already loaded — skip
+    ingested_at = dt.datetime.utcnow()
+    rows = []
+    for job in jobs:
+        job_id = str(job.get("id", ""))
+        if job_id:
+            rows.append((source, job_id, json.dumps(job), ingested_at))
+    if not rows:
+        return 0, 0
 
-        con.execute(
-            """
+    raw_df = pd.DataFrame(rows, columns=["source", "source_job_id", "payload_json", "ingested_at"])
+    con.register("raw_df", raw_df)
+    try:
+        inserted = con.execute("""
             INSERT INTO raw_job_postings (source, source_job_id, payload_json, ingested_at)
-            VALUES (?, ?, ?, ?)
-            """,
-            [source, source_job_id, json.dumps(payload), dt.datetime.utcnow()]
-        )
-        return True
+            SELECT source, source_job_id, payload_json::JSON, ingested_at FROM raw_df
+            ON CONFLICT DO NOTHING
+        """).fetchone()[0]
     finally:
-        con.close()
+        con.unregister("raw_df")
+    return inserted, len(rows) - inserted
 
 
 # ── Main ingest runner ────────────────────────────────────────────────────────
 
-def run_ingest() -> dict:
+def run_ingest(con=None) -> dict:
     """
     Fetch from all sources and load into raw layer.
     Returns a summary dict with counts.
     """
-    stats = {"remotive_new": 0, "remoteok_new": 0, "remotive_skipped": 0, "remoteok_skipped": 0}
-
-    for job in fetch_remotive():
-        job_id = str(job.get("id", ""))
-        if job_id:
-            inserted = upsert_raw("remotive", job_id, job)
-            if inserted:
-                stats["remotive_new"] += 1
-            else:
-                stats["remotive_skipped"] += 1
-
-    for job in fetch_remoteok():
-        job_id = str(job.get("id", ""))
-        if job_id:
-            inserted = upsert_raw("remoteok", job_id, job)
-            if inserted:
-                stats["remoteok_new"] += 1
-            else:
-                stats["remoteok_skipped"] += 1
+    # Fetch before connecting so a standalone run doesn't hold the warehouse
+    # open during HTTP calls
+    remotive_jobs = fetch_remotive()
+    remoteok_jobs = fetch_remoteok()
+
+    stats = {}
+    own_con = con is None
+    if own_con:
+        con = connect()
+    try:
+        stats["remotive_new"], stats["remotive_skipped"] = upsert_raw(con, "remotive", remotive_jobs)
+        stats["remoteok_new"], stats["remoteok_skipped"] = upsert_raw(con, "remoteok", remoteok_jobs)
+    finally:
+        if own_con:
+            con.close()
 
     log.info(
         "Ingest complete — Remotive: %d new / %d skipped | RemoteOK: %d new / %d skipped",
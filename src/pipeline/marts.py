@@ -5,33 +5,56 @@ Gold layer is what the dashboard reads. Pre-aggregating here means:
   - Dashboard loads fast (reads a small table, not millions of rows)
   - Analytics logic lives in ONE place (easy to maintain)
 
+Each mart is rebuilt with CREATE OR REPLACE TABLE ... AS SELECT, which swaps
+in fresh storage atomically instead of DELETE + INSERT (which leaves deleted
+rows behind in the file until a checkpoint/vacuum).
+
+The skill marts share one join (fact × bridge × role), so it is materialized
+once into a temp table (_wide_jobs) and both marts are plain GROUP BYs on it.
+bridge_job_skill is unique on (job_id, skill) and fact_job_posting on job_id,
+so every mart counts with COUNT(*) rather than COUNT(DISTINCT job_id).
+
 Marts built:
   - mart_top_skills_daily     — which skills appear most in job postings
   - mart_skill_by_seniority   — skills broken down by seniority level
   - mart_top_companies        — companies posting the most jobs
+  - mart_latest_jobs          — flat, pre-joined job listing, newest first
+
+export_marts() then writes the marts to Parquet in ASSETS_DIR — that's what the Streamlit Cloud dashboard reads.
 """
+from pathlib import Path
+
+from .config import ASSETS_DIR
 from .db import connect
 from .logger import get_logger
 
 log = get_logger(__name__)
 
 
-def build_marts() -> dict:
+def build_marts(con=None) -> dict:
     """Rebuild all gold mart tables from the silver layer."""
-    con = connect()
+    own_con = con is None
+    if own_con:
+        con = connect()
+
+    # ── _wide_jobs (one row per job × skill, shared by the skill marts) ───────
+    con.execute("""
+        CREATE OR REPLACE TEMP TABLE _wide_jobs AS
+        SELECT f.job_id, f.posted_date, r.seniority, b.skill
+        FROM fact_job_posting f
+        JOIN bridge_job_skill b USING (job_id)
+        LEFT JOIN dim_role r    ON r.role_id = f.role_id
+        WHERE b.skill != '';
+    """)
 
     # ── mart_top_skills_daily ─────────────────────────────────────────────────
-    # Clear and rebuild (simple approach — fine for a portfolio project)
-    con.execute("DELETE FROM mart_top_skills_daily;")
     con.execute("""
-        INSERT INTO mart_top_skills_daily (date, skill, job_count)
+        CREATE OR REPLACE TABLE mart_top_skills_daily AS
         SELECT
-            COALESCE(f.posted_date, CURRENT_DATE) AS date,
-            b.skill,
-            COUNT(DISTINCT f.job_id)              AS job_count
-        FROM fact_job_posting f
-        JOIN bridge_job_skill b ON b.job_id = f.job_id
-        WHERE b.skill != ''
+            COALESCE(posted_date, CURRENT_DATE) AS date,
+            skill,
+            COUNT(*)                            AS job_count
+        FROM _wide_jobs
         GROUP BY 1, 2
         ORDER BY 3 DESC;
     """)
@@ -40,18 +63,14 @@ def build_marts() -> dict:
     log.info("mart_top_skills_daily — %d rows", skill_rows)
 
     # ── mart_skill_by_seniority ───────────────────────────────────────────────
-    con.execute("DELETE FROM mart_skill_by_seniority;")
     con.execute("""
-        INSERT INTO mart_skill_by_seniority (seniority, skill, job_count)
+        CREATE OR REPLACE TABLE mart_skill_by_seniority AS
         SELECT
-            r.seniority,
-            b.skill,
-            COUNT(DISTINCT f.job_id) AS job_count
-        FROM fact_job_posting f
-        JOIN dim_role r         ON r.role_id  = f.role_id
-        JOIN bridge_job_skill b ON b.job_id   = f.job_id
-        WHERE b.skill != ''
-          AND r.seniority != 'unknown'
+            seniority,
+            skill,
+            COUNT(*) AS job_count
+        FROM _wide_jobs
+        WHERE seniority != 'unknown'
         GROUP BY 1, 2
         ORDER BY 3 DESC;
     """)
@@ -59,13 +78,14 @@ def build_marts() -> dict:
     seniority_rows = con.execute("SELECT COUNT(*) FROM mart_skill_by_seniority").fetchone()[0]
     log.info("mart_skill_by_seniority — %d rows", seniority_rows)
 
+    con.execute("DROP TABLE _wide_jobs")
+
     # ── mart_top_companies ────────────────────────────────────────────────────
-    con.execute("DELETE FROM mart_top_companies;")
     con.execute("""
-        INSERT INTO mart_top_companies (company_name, job_count)
+        CREATE OR REPLACE TABLE mart_top_companies AS
         SELECT
             c.company_name,
-            COUNT(DISTINCT f.job_id) AS job_count
+            COUNT(*) AS job_count
         FROM fact_job_posting f
         JOIN dim_company c ON c.company_id = f.company_id
         WHERE c.company_name IS NOT NULL
@@ -77,10 +97,66 @@ def build_marts() -> dict:
     company_rows = con.execute("SELECT COUNT(*) FROM mart_top_companies").fetchone()[0]
     log.info("mart_top_companies — %d rows", company_rows)
 
-    con.close()
+    # ── mart_latest_jobs ──────────────────────────────────────────────────────
+    # Every job, not just the 50 shown: the dashboard's job and enrichment
+    # KPIs are counted from this listing too. Only displayed columns are kept.
+    con.execute("""
+        CREATE OR REPLACE TABLE mart_latest_jobs AS
+        SELECT
+            f.title,
+            c.company_name,
+            l.location_name,
+            r.role_family,
+            r.seniority,
+            f.posted_date,
+            f.url
+        FROM fact_job_posting f
+        LEFT JOIN dim_company  c ON c.company_id  = f.company_id
+        LEFT JOIN dim_location l ON l.location_id = f.location_id
+        LEFT JOIN dim_role     r ON r.role_id     = f.role_id
+        ORDER BY f.posted_date DESC NULLS LAST, f.inserted_at DESC;
+    """)
+
+    latest_rows = con.execute("SELECT COUNT(*) FROM mart_latest_jobs").fetchone()[0]
+    log.info("mart_latest_jobs — %d rows", latest_rows)
+
+    if own_con:
+        con.close()
     log.info("All marts rebuilt successfully.")
     return {
         "mart_top_skills_daily":   skill_rows,
         "mart_skill_by_seniority": seniority_rows,
         "mart_top_companies":      company_rows,
+        "mart_latest_jobs":        latest_rows,
     }
+
+
+# Asset file → query. Parquet is columnar and typed, so the dashboard loads
+# it in bulk instead of parsing CSV text row by row.
+EXPORTS = {
+    "skills.parquet":    "SELECT * FROM mart_top_skills_daily",
+    "seniority.parquet": "SELECT * FROM mart_skill_by_seniority",
+    "companies.parquet": "SELECT * FROM mart_top_companies",
+    "jobs.parquet":      "SELECT * FROM mart_latest_jobs",
+}
+
+
+def export_marts(assets_dir: str = ASSETS_DIR, con=None) -> dict:
+    """Write the gold marts to Parquet files for the dashboard."""
+    out_dir = Path(assets_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    own_con = con is None
+    if own_con:
+        con = connect()
+
+    stats = {}
+    for filename, query in EXPORTS.items():
+        path = str(out_dir / filename).replace("'", "''")
+        stats[filename] = con.execute(
+            f"COPY ({query}) TO '{path}' (FORMAT PARQUET, COMPRESSION ZSTD)"
+        ).fetchone()[0]
+        log.info("Exported %s — %d rows", filename, stats[filename])
+
+    if own_con:
+        con.close()
+    return stats
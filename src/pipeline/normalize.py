@@ -8,10 +8,16 @@ What we do here:
   - Create stable IDs using MD5 hashes (so re-runs don't break FK references)
   - Insert into dim_company, dim_location, dim_role, fact_job_posting
   - Skip rows that already exist (idempotency)
+
+DuckDB does the bulk work: it filters out jobs that already exist, extracts
+the needed JSON fields, and copies + hashes descriptions itself. The small
+per-row fields are cleaned in Python into one staging DataFrame, then written
+with a handful of set-based INSERT ... SELECT statements.
 """
 import hashlib
 import datetime as dt
-import json
+
+import pandas as pd
 
 from .db import connect
 from .logger import get_logger
@@ -26,9 +32,6 @@ log = get_logger(__name__)
 def _md5(text: str) -> str:
     return hashlib.md5((text or "unknown").encode("utf-8")).hexdigest()
 
-def _sha256(text: str) -> str:
-    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
-
 def company_id(name: str) -> str:
     return _md5(name or "unknown")
 
@@ -41,6 +44,9 @@ def role_id(role_family: str, seniority: str) -> str:
 def job_id(source: str, source_job_id: str) -> str:
     return _md5(f"{source}:{source_job_id}")
 
+# Every new job starts with the unknown role; the AI step updates it later
+_UNKNOWN_ROLE_ID = role_id("unknown", "unknown")
+
 
 # ── Date parsing ──────────────────────────────────────────────────────────────
 
@@ -48,6 +54,14 @@ def _parse_date(value) -> dt.date | None:
     """Try to extract a date from various formats (ISO string, Unix timestamp, etc.)."""
     if not value:
         return None
+    # Fast path: nearly every posting date is "YYYY-MM-DD..." — build the date
+    # from the digits directly instead of slicing into fromisoformat
+    if (isinstance(value, str) and len(value) >= 10 and value[4] == "-" and value[7] == "-"
+            and value[:4].isdigit() and value[5:7].isdigit() and value[8:10].isdigit()):
+        try:
+            return dt.date(int(value[:4]), int(value[5:7]), int(value[8:10]))
+        except ValueError:
+            return None   # e.g. month 13
     try:
         if isinstance(value, str):
             return dt.date.fromisoformat(value[:10])
@@ -60,102 +74,165 @@ def _parse_date(value) -> dt.date | None:
 
 # ── Per-source field extraction ───────────────────────────────────────────────
 
-def _extract_remotive(payload: dict) -> dict:
-    return {
-        "title":       payload.get("title"),
-        "company":     payload.get("company_name"),
-        "location":    payload.get("candidate_required_location") or "Remote",
-        "url":         payload.get("url"),
-        "description": payload.get("description") or "",
-        "posted":      payload.get("publication_date"),
-    }
-
-def _extract_remoteok(payload: dict) -> dict:
-    return {
-        "title":       payload.get("position"),
-        "company":     payload.get("company"),
-        "location":    payload.get("location") or "Remote",
-        "url":         payload.get("url"),
-        "description": payload.get("description") or "",
-        "posted":      payload.get("date"),
-    }
+# JSON paths of the fields we keep, per source, in this order:
+#   title, company, location, url, posted
+# DuckDB pulls just these out of payload_json in one parse per row, so the
+# rest of the payload (tags, salary, ...) never reaches Python.
+SOURCE_FIELD_PATHS = {
+    "remotive": ["$.title", "$.company_name", "$.candidate_required_location",
+                 "$.url", "$.publication_date"],
+    "remoteok": ["$.position", "$.company", "$.location",
+                 "$.url", "$.date"],
+}
+
+# The description (same path in both sources) is the bulk of each payload.
+# It never enters Python: the fact insert reads it from raw_job_postings and
+# hashes it with DuckDB's sha256(), which matches hashlib's hex digest.
+DESCRIPTION_PATH = "$.description"
+
+# json_type() names for numeric values — posted dates can be Unix timestamps
+_JSON_NUMBER_TYPES = {"UBIGINT", "BIGINT", "DOUBLE"}
+
+
+def _raw_fields_query() -> str:
+    """
+    SELECT over raw rows not yet in fact_job_posting, returning
+    (job_id, source, source_job_id, fields, posted_type). job_id is md5()
+    in SQL — the same hex as job_id() — so the anti-join needs no Python.
+    """
+    def paths(source: str) -> str:
+        return "[" + ", ".join(f"'{p}'" for p in SOURCE_FIELD_PATHS[source]) + "]"
+
+    def posted(source: str) -> str:
+        return f"'{SOURCE_FIELD_PATHS[source][-1]}'"
+
+    return f"""
+        SELECT
+            r.job_id,
+            source,
+            source_job_id,
+            CASE WHEN source = 'remotive'
+                 THEN json_extract_string(payload_json, {paths("remotive")})
+                 ELSE json_extract_string(payload_json, {paths("remoteok")})
+            END AS fields,
+            CASE WHEN source = 'remotive'
+                 THEN json_type(payload_json, {posted("remotive")})
+                 ELSE json_type(payload_json, {posted("remoteok")})
+            END AS posted_type
+        FROM (
+            SELECT md5(source || ':' || source_job_id) AS job_id, *
+            FROM raw_job_postings
+        ) r
+        WHERE NOT EXISTS (SELECT 1 FROM fact_job_posting f WHERE f.job_id = r.job_id)
+    """
 
 
 # ── Main normalizer ───────────────────────────────────────────────────────────
 
-def normalize_all() -> dict:
+FETCH_SIZE = 1024   # raw rows per fetch — DuckDB's vector size
+
+STAGE_COLUMNS = [
+    "job_id", "source", "source_job_id", "title",
+    "company_id", "location_id", "posted_date", "url",
+]
+
+
+def normalize_all(con=None) -> dict:
     """
     Read all raw rows and write cleaned records to Silver tables.
     Returns a summary dict.
     """
-    con = connect()
-    rows = con.execute(
-        "SELECT source, source_job_id, payload_json FROM raw_job_postings"
-    ).fetchall()
-
-    inserted = 0
-    skipped  = 0
-
-    for source, source_job_id, payload_json in rows:
-        payload = json.loads(payload_json)
-
-        # Extract fields based on which API this came from
-        if source == "remotive":
-            fields = _extract_remotive(payload)
-        else:
-            fields = _extract_remoteok(payload)
-
-        title       = fields["title"]
-        company     = fields["company"] or "Unknown"
-        location    = fields["location"] or "Remote"
-        url         = fields["url"]
-        description = fields["description"]
-        posted_date = _parse_date(fields["posted"])
-
-        # Generate stable IDs
-        c_id = company_id(company)
-        l_id = location_id(location)
-        r_id = role_id("unknown", "unknown")   # AI step will update this later
-        j_id = job_id(source, source_job_id)
-        desc_hash = _sha256(description)
-
-        # Skip if this job is already in the fact table
-        exists = con.execute(
-            "SELECT 1 FROM fact_job_posting WHERE job_id = ? LIMIT 1", [j_id]
-        ).fetchone()
-        if exists:
-            skipped += 1
-            continue
-
-        remote_flag = "remote" in location.lower()
-
+    own_con = con is None
+    if own_con:
+        con = connect()
+    # Jobs already in the fact table are filtered out in SQL (idempotency)
+    total_raw = con.execute("SELECT COUNT(*) FROM raw_job_postings").fetchone()[0]
+    cursor = con.execute(_raw_fields_query())
+
+    # Stream in vector-sized chunks; only the small staged tuples accumulate.
+    # Companies and locations repeat across many postings, so they're collected
+    # once each (name → ID) and the dims get one row per distinct value.
+    stage = []
+    companies: dict[str, str] = {}
+    locations: dict[str, str] = {}
+    while rows := cursor.fetchmany(FETCH_SIZE):
+        for j_id, source, source_job_id, fields, posted_type in rows:
+            title, company, location, url, posted = fields
+            company  = company or "Unknown"
+            location = location or "Remote"
+            if posted is not None and posted_type in _JSON_NUMBER_TYPES:
+                posted = float(posted)
+
+            c_id = companies.get(company)
+            if c_id is None:
+                c_id = companies[company] = company_id(company)
+            l_id = locations.get(location)
+            if l_id is None:
+                l_id = locations[location] = location_id(location)
+
+            stage.append((
+                j_id,
+                source,
+                source_job_id,
+                title,
+                c_id,
+                l_id,
+                _parse_date(posted),
+                url,
+            ))
+
+    stage_df = pd.DataFrame(stage, columns=STAGE_COLUMNS)
+    companies_df = pd.DataFrame(list(companies.items()), columns=["company_name", "company_id"])
+    locations_df = pd.DataFrame(list(locations.items()), columns=["location_name", "location_id"])
+    con.register("stage_df", stage_df)
+    con.register("companies_df", companies_df)
+    con.register("locations_df", locations_df)
+
+    # All dim + fact writes commit together, or not at all
+    con.begin()
+    try:
         # Upsert dimension tables (INSERT OR IGNORE = safe to re-run)
+        con.execute("""
+            INSERT OR IGNORE INTO dim_company (company_id, company_name)
+            SELECT company_id, company_name FROM companies_df
+        """)
+        # remote_flag is derived here, once per distinct location, not per row
+        con.execute("""
+            INSERT OR IGNORE INTO dim_location (location_id, location_name, remote_flag)
+            SELECT location_id, location_name, contains(lower(location_name), 'remote')
+            FROM locations_df
+        """)
         con.execute(
-            "INSERT OR IGNORE INTO dim_company (company_id, company_name) VALUES (?, ?)",
-            [c_id, company]
-        )
-        con.execute(
-            "INSERT OR IGNORE INTO dim_location (location_id, location_name, remote_flag) VALUES (?, ?, ?)",
-            [l_id, location, remote_flag]
-        )
-        con.execute(
-            "INSERT OR IGNORE INTO dim_role (role_id, role_family, seniority) VALUES (?, ?, ?)",
-            [r_id, "unknown", "unknown"]
+            "INSERT OR IGNORE INTO dim_role (role_id, role_family, seniority) VALUES (?, 'unknown', 'unknown')",
+            [_UNKNOWN_ROLE_ID],
         )
 
-        # Insert fact row
-        con.execute(
-            """
+        # Insert fact rows
+        con.execute(f"""
             INSERT INTO fact_job_posting
                 (job_id, source, source_job_id, title, company_id, location_id, role_id,
                  posted_date, description, description_hash, url, inserted_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, now())
-            """,
-            [j_id, source, source_job_id, title, c_id, l_id, r_id,
-             posted_date, description, desc_hash, url]
-        )
-        inserted += 1
-
-    con.close()
+            SELECT job_id, source, source_job_id, title, company_id, location_id, ?,
+                   posted_date::DATE, description, sha256(description), url, now()
+            FROM (
+                SELECT s.*,
+                       COALESCE(json_extract_string(r.payload_json, '{DESCRIPTION_PATH}'), '') AS description
+                FROM stage_df s
+                JOIN raw_job_postings r USING (source, source_job_id)
+            )
+        """, [_UNKNOWN_ROLE_ID])
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.unregister("stage_df")
+        con.unregister("companies_df")
+        con.unregister("locations_df")
+
+    if own_con:
+        con.close()
+    inserted = len(stage)
+    skipped  = total_raw - inserted
     log.info("Normalize complete — %d inserted, %d already existed", inserted, skipped)
     return {"inserted": inserted, "skipped": skipped}
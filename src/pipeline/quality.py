@@ -16,23 +16,38 @@ from .logger import get_logger
 log = get_logger(__name__)
 
 
-def run_quality_checks() -> dict:
+def run_quality_checks(con=None) -> dict:
     """
     Run all quality checks. Returns a dict of {check_name: passed (bool)}.
     """
-    con = connect()
+    own_con = con is None
+    if own_con:
+        con = connect()
     results = {}
 
-    # ── Check 1: No duplicate job IDs in fact table ───────────────────────────
-    dupes = con.execute("""
-        SELECT COUNT(*) FROM (
-            SELECT job_id, COUNT(*) AS n
-            FROM fact_job_posting
-            GROUP BY job_id
-            HAVING n > 1
-        )
-    """).fetchone()[0]
+    # All five counts in one query — one round-trip instead of one per check
+    dupes, orphan_companies, null_titles, blank_skills, total_jobs = con.execute("""
+        SELECT
+            -- Check 1: duplicate job IDs in fact table
+            (SELECT COUNT(*) FROM (
+                SELECT job_id FROM fact_job_posting GROUP BY job_id HAVING COUNT(*) > 1
+            )),
+            -- Check 2: fact rows without a matching company
+            (SELECT COUNT(*)
+             FROM fact_job_posting f
+             LEFT JOIN dim_company c ON c.company_id = f.company_id
+             WHERE c.company_id IS NULL),
+            -- Check 3: fact rows with a NULL title
+            (SELECT COUNT(*) FROM fact_job_posting WHERE title IS NULL),
+            -- Check 4: blank skills in bridge_job_skill
+            (SELECT COUNT(*) FROM bridge_job_skill WHERE TRIM(skill) = ''),
+            -- Check 5: total job count
+            (SELECT COUNT(*) FROM fact_job_posting)
+    """).fetchone()
+    if own_con:
+        con.close()
 
+    # ── Check 1: No duplicate job IDs in fact table ───────────────────────────
     if dupes == 0:
         log.info("✅ PASS — No duplicate job_ids in fact_job_posting")
         results["no_duplicate_jobs"] = True
@@ -41,13 +56,6 @@ def run_quality_checks() -> dict:
         results["no_duplicate_jobs"] = False
 
     # ── Check 2: All fact rows have a valid company_id ────────────────────────
-    orphan_companies = con.execute("""
-        SELECT COUNT(*)
-        FROM fact_job_posting f
-        LEFT JOIN dim_company c ON c.company_id = f.company_id
-        WHERE c.company_id IS NULL
-    """).fetchone()[0]
-
     if orphan_companies == 0:
         log.info("✅ PASS — All fact rows have a matching dim_company entry")
         results["company_fk_ok"] = True
@@ -56,10 +64,6 @@ def run_quality_checks() -> dict:
         results["company_fk_ok"] = False
 
     # ── Check 3: All fact rows have a title (not NULL) ────────────────────────
-    null_titles = con.execute("""
-        SELECT COUNT(*) FROM fact_job_posting WHERE title IS NULL
-    """).fetchone()[0]
-
     if null_titles == 0:
         log.info("✅ PASS — No NULL titles in fact_job_posting")
         results["no_null_titles"] = True
@@ -68,10 +72,6 @@ def run_quality_checks() -> dict:
         results["no_null_titles"] = False
 
     # ── Check 4: bridge_job_skill has no blank skills ─────────────────────────
-    blank_skills = con.execute("""
-        SELECT COUNT(*) FROM bridge_job_skill WHERE TRIM(skill) = ''
-    """).fetchone()[0]
-
     if blank_skills == 0:
         log.info("✅ PASS — No blank skill entries in bridge_job_skill")
         results["no_blank_skills"] = True
@@ -80,7 +80,6 @@ def run_quality_checks() -> dict:
         results["no_blank_skills"] = False
 
     # ── Check 5: Total job count is reasonable ────────────────────────────────
-    total_jobs = con.execute("SELECT COUNT(*) FROM fact_job_posting").fetchone()[0]
     if total_jobs > 0:
         log.info("✅ PASS — fact_job_posting has %d rows (non-empty)", total_jobs)
         results["fact_not_empty"] = True
@@ -88,8 +87,6 @@ def run_quality_checks() -> dict:
         log.warning("❌ FAIL — fact_job_posting is empty!")
         results["fact_not_empty"] = False
 
-    con.close()
-
     passed = sum(1 for v in results.values() if v)
     total  = len(results)
     log.info("Quality checks: %d / %d passed", passed, total)
@@ -4,15 +4,32 @@ tests/test_pipeline.py — Basic unit tests for the pipeline.
 Run with:  python -m pytest tests/ -v
 
 These tests verify that core functions work correctly
-without needing a live database or internet connection.
+without needing a live database or internet connection — the
+warehouse tests run against a throwaway DuckDB file in tmp_path.
 """
 import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from src.pipeline.normalize import _parse_date, company_id, job_id
-from src.pipeline.ai_extract import _fallback_extract, Extraction
+from src.pipeline.db import init_db
+from src.pipeline.ingest import upsert_raw
+from src.pipeline.marts import build_marts, export_marts
+from src.pipeline.normalize import (
+    _parse_date, company_id, job_id, location_id, role_id, normalize_all,
+)
+from src.pipeline import ai_extract
+from src.pipeline.ai_extract import (
+    _fallback_extract, _fallback_enrich_sql, _extract_chunk, _read_json_stream, _CircuitBreaker,
+    Extraction,
+)
 import datetime as dt
+import hashlib
+import json
+import threading
+import time
+
+import duckdb
+import pytest
 
 
 class TestDateParsing:
@@ -34,6 +51,9 @@ class TestDateParsing:
     def test_empty_string(self):
         assert _parse_date("") is None
 
+    def test_invalid_iso_date(self):
+        assert _parse_date("2024-13-40") is None
+
 
 class TestIdGeneration:
     def test_company_id_is_deterministic(self):
@@ -49,6 +69,15 @@ class TestIdGeneration:
     def test_different_sources_produce_different_ids(self):
         assert job_id("remotive", "123") != job_id("remoteok", "123")
 
+    def test_sql_hashes_match_python(self):
+        """normalize computes job_id and description_hash in DuckDB — they must match."""
+        text = "Café – données 数据"
+        sql_job_id, sql_hash = duckdb.connect().execute(
+            "SELECT md5('remotive' || ':' || '123'), sha256(?)", [text]
+        ).fetchone()
+        assert sql_job_id == job_id("remotive", "123")
+        assert sql_hash == hashlib.sha256(text.encode()).hexdigest()
+
 
 class TestFallbackExtractor:
     def test_detects_python(self):
@@ -68,6 +97,20 @@ class TestFallbackExtractor:
         result = _fallback_extract("Accountant", "Manage spreadsheets")
         assert result["role_family"] == "unknown"
 
+    def test_skills_match_whole_words_only(self):
+        result = _fallback_extract("Engineer", "We use pyspark and gitlab daily")
+        assert "pyspark" in result["skills"]
+        assert "spark" not in result["skills"]
+        assert "git" not in result["skills"]
+
+    def test_keyword_counts_for_every_category(self):
+        # "spark" is both a skill and a data-engineering keyword;
+        # "senior" outranks "lead" because levels are checked in order
+        result = _fallback_extract("Team Lead", "Senior role working with spark")
+        assert "spark" in result["skills"]
+        assert result["role_family"] == "data_engineering"
+        assert result["seniority"] == "senior"
+
     def test_skills_are_lowercase(self):
         result = _fallback_extract("Engineer", "Must know Python, SQL, and AWS")
         for skill in result["skills"]:
@@ -93,3 +136,402 @@ class TestExtractionSchema:
             # If it doesn't raise, it should fall back
         except Exception:
             pass  # Expected
+
+
+class TestCircuitBreaker:
+    def test_trips_after_consecutive_failures(self):
+        breaker = _CircuitBreaker(threshold=3)
+        for _ in range(3):
+            breaker.record(ok=False)
+        assert breaker.tripped
+
+    def test_success_resets_failure_count(self):
+        breaker = _CircuitBreaker(threshold=3)
+        breaker.record(ok=False)
+        breaker.record(ok=False)
+        breaker.record(ok=True)
+        breaker.record(ok=False)
+        assert not breaker.tripped
+
+
+def _stream(*pieces):
+    """Fake Ollama NDJSON stream lines for the given response pieces."""
+    return [json.dumps({"response": p, "done": False}).encode() for p in pieces]
+
+
+class TestOllamaStreamParsing:
+    def test_returns_complete_object(self):
+        lines = _stream('{"seniority": ', '"senior", "skills": ["python"]}')
+        assert _read_json_stream(lines) == {"seniority": "senior", "skills": ["python"]}
+
+    def test_stops_at_first_complete_object(self):
+        def lines():
+            yield from _stream('{"a": {"b": 1}', "}")
+            raise AssertionError("read past the end of the object")
+        assert _read_json_stream(lines()) == {"a": {"b": 1}}
+
+    def test_rejects_prose(self):
+        with pytest.raises(ValueError):
+            _read_json_stream(_stream("Sure! Here is", " the JSON"))
+
+
+class _FakeResponse:
+    def __init__(self, answer):
+        self.lines = _stream(json.dumps(answer))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+
+class TestOllamaBatchAnswer:
+    JOBS = [
+        ("j1", "Data Engineer", "Airflow and dbt", "h1", None),
+        ("j2", "Analyst", "Looker dashboards", "h2", None),
+    ]
+
+    def _extract(self, monkeypatch, answer):
+        monkeypatch.setattr(ai_extract._session, "post", lambda *a, **kw: _FakeResponse(answer))
+        breaker = _CircuitBreaker(threshold=3)
+        results = _extract_chunk(self.JOBS, breaker)
+        return [source for *_, source in results], breaker
+
+    def test_ignored_schema_counts_as_failure(self, monkeypatch):
+        sources, breaker = self._extract(monkeypatch, {"seniority": "senior", "skills": ["python"]})
+        assert sources == ["fallback", "fallback"]
+        assert breaker.failures == 1
+
+    def test_partial_answer_falls_back_per_posting(self, monkeypatch):
+        answer = {"jobs": [{"id": 1, "seniority": "mid", "role_family": "analytics", "skills": []}]}
+        sources, breaker = self._extract(monkeypatch, answer)
+        assert sources == ["fallback", "llm"]
+        assert breaker.failures == 0
+
+
+@pytest.fixture
+def warehouse(tmp_path):
+    """A fresh, initialised DuckDB warehouse in a temp dir."""
+    con = duckdb.connect(str(tmp_path / "jobs.duckdb"))
+    init_db(con=con)
+    yield con
+    con.close()
+
+
+class TestUpsertRaw:
+    def _ids(self, con):
+        return [r[0] for r in con.execute(
+            "SELECT source_job_id FROM raw_job_postings ORDER BY source_job_id"
+        ).fetchall()]
+
+    def test_first_load_and_reload(self, warehouse):
+        assert upsert_raw(warehouse, "remotive", [{"id": 1}, {"id": 2}]) == (2, 0)
+        assert upsert_raw(warehouse, "remotive", [{"id": 2}, {"id": 3}]) == (1, 1)
+        # Same id under another source is a different job
+        assert upsert_raw(warehouse, "remoteok", [{"id": 1}]) == (1, 0)
+        assert self._ids(warehouse) == ["1", "1", "2", "3"]
+
+    def test_duplicate_id_within_a_batch(self, warehouse):
+        jobs = [{"id": 7, "title": "a"}, {"id": 7, "title": "b"}, {"id": 8}]
+        assert upsert_raw(warehouse, "remotive", jobs) == (2, 1)
+        assert self._ids(warehouse) == ["7", "8"]
+
+    def test_jobs_without_an_id_are_dropped(self, warehouse):
+        assert upsert_raw(warehouse, "remotive", [{"id": ""}, {"title": "no id"}]) == (0, 0)
+        assert upsert_raw(warehouse, "remotive", []) == (0, 0)
+        assert self._ids(warehouse) == []
+
+
+class TestNormalize:
+    REMOTIVE = {
+        "id": 1, "title": "Data Engineer", "company_name": None,
+        "candidate_required_location": "", "url": "https://r/1",
+        "description": "Build pipelines — café", "publication_date": "2024-06-15T10:00:00",
+        "tags": ["etl"], "salary": "100k",
+    }
+    REMOTEOK = {
+        "id": "7", "position": "Analyst", "company": "Acme",
+        "location": "Berlin", "url": "https://ok/7",
+        "description": None, "date": 1718409600,  # Unix time, 2024-06-15 UTC
+    }
+
+    def _load(self, con, new=1):
+        assert upsert_raw(con, "remotive", [self.REMOTIVE]) == (new, 1 - new)
+        assert upsert_raw(con, "remoteok", [self.REMOTEOK]) == (new, 1 - new)
+        return normalize_all(con=con)
+
+    def test_fact_and_dim_rows(self, warehouse):
+        assert self._load(warehouse) == {"inserted": 2, "skipped": 0}
+
+        facts = warehouse.execute("""
+            SELECT job_id, source, source_job_id, title, company_id, location_id,
+                   role_id, posted_date, description, description_hash, url
+            FROM fact_job_posting ORDER BY source
+        """).fetchall()
+        unknown_role = role_id("unknown", "unknown")
+        desc = self.REMOTIVE["description"]
+        assert facts == [
+            (job_id("remoteok", "7"), "remoteok", "7", "Analyst",
+             company_id("Acme"), location_id("Berlin"), unknown_role,
+             dt.date(2024, 6, 15), "", hashlib.sha256(b"").hexdigest(), "https://ok/7"),
+            (job_id("remotive", "1"), "remotive", "1", "Data Engineer",
+             company_id("Unknown"), location_id("Remote"), unknown_role,
+             dt.date(2024, 6, 15), desc, hashlib.sha256(desc.encode()).hexdigest(), "https://r/1"),
+        ]
+
+        assert sorted(warehouse.execute("SELECT * FROM dim_company").fetchall()) == sorted([
+            (company_id("Acme"), "Acme"), (company_id("Unknown"), "Unknown"),
+        ])
+        assert sorted(warehouse.execute("SELECT * FROM dim_location").fetchall()) == sorted([
+            (location_id("Berlin"), "Berlin", False), (location_id("Remote"), "Remote", True),
+        ])
+        assert warehouse.execute("SELECT * FROM dim_role").fetchall() == [
+            (unknown_role, "unknown", "unknown"),
+        ]
+
+    def test_second_run_inserts_nothing(self, warehouse):
+        self._load(warehouse)
+        assert self._load(warehouse, new=0) == {"inserted": 0, "skipped": 2}
+        assert warehouse.execute("SELECT COUNT(*) FROM fact_job_posting").fetchone()[0] == 2
+
+
+def _insert_jobs(con, jobs):
+    """Insert bare fact rows for (job_id, title, description) tuples."""
+    for j_id, title, description in jobs:
+        con.execute(
+            """
+            INSERT INTO fact_job_posting (job_id, title, role_id, description, description_hash)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [j_id, title, role_id("unknown", "unknown"), description,
+             hashlib.sha256(description.encode()).hexdigest()],
+        )
+
+
+def _enrichment(con) -> dict:
+    """{job_id: (seniority, role_family, sorted skills)} as stored in the warehouse."""
+    roles = dict(con.execute("""
+        SELECT f.job_id, (r.seniority, r.role_family)
+        FROM fact_job_posting f JOIN dim_role r ON r.role_id = f.role_id
+    """).fetchall())
+    skills = {}
+    for j_id, skill in con.execute("SELECT job_id, skill FROM bridge_job_skill").fetchall():
+        skills.setdefault(j_id, []).append(skill)
+    return {j_id: (*roles[j_id], sorted(skills.get(j_id, []))) for j_id in roles}
+
+
+class TestSqlFallbackParity:
+    JOBS = [
+        ("j1", "Engineer", "We use pyspark and gitlab daily"),            # word boundaries
+        ("j2", "Team Lead", "Senior role working with spark"),            # seniority priority
+        ("j3", "Data Scientist", "Machine learning with Python, SQL and Power BI"),
+        ("j4", "Accountant", "Manage spreadsheets"),
+    ]
+
+    def test_matches_python_fallback(self, warehouse):
+        _insert_jobs(warehouse, self.JOBS)
+        assert _fallback_enrich_sql(warehouse) == len(self.JOBS)
+
+        expected = {}
+        for j_id, title, description in self.JOBS:
+            result = _fallback_extract(title, description)
+            expected[j_id] = (result["seniority"], result["role_family"], sorted(result["skills"]))
+        assert _enrichment(warehouse) == expected
+        assert "spark" not in expected["j1"][2]
+        assert expected["j2"][0] == "senior"
+
+
+class TestEnrichmentCache:
+    JOBS = [
+        ("j1", "Data Engineer", "Shared description"),
+        ("j2", "Data Engineer II", "Shared description"),   # same hash, same batch
+        ("j3", "Analyst", "Something else entirely"),
+    ]
+    ANSWER = {"seniority": "senior", "role_family": "data_engineering", "skills": ["Python", " SQL "]}
+
+    @pytest.fixture
+    def llm_calls(self, monkeypatch):
+        """Stub Ollama out; returns the list of batch sizes it was called with."""
+        calls = []
+
+        def fake_call(postings):
+            calls.append(len(postings))
+            return [dict(self.ANSWER) for _ in postings]
+
+        monkeypatch.setattr(ai_extract, "USE_OLLAMA", True)
+        monkeypatch.setattr(ai_extract, "_ping_ollama", lambda: True)
+        monkeypatch.setattr(ai_extract, "_call_ollama", fake_call)
+        return calls
+
+    def test_second_run_is_served_from_cache(self, warehouse, llm_calls):
+        _insert_jobs(warehouse, self.JOBS)
+        enriched = {j_id: ("senior", "data_engineering", ["python", "sql"]) for j_id, _, _ in self.JOBS}
+
+        stats = ai_extract.run_ai_enrichment(con=warehouse)
+        assert stats == {"enriched": 3, "cache": 0, "llm": 3, "fallback": 0}
+        assert llm_calls == [2]   # j2 reuses j1's answer
+        assert _enrichment(warehouse) == enriched
+        # One cache row per distinct description
+        assert warehouse.execute("SELECT COUNT(*) FROM ai_extraction_cache").fetchone()[0] == 2
+
+        warehouse.execute("DELETE FROM bridge_job_skill")
+        llm_calls.clear()
+        stats = ai_extract.run_ai_enrichment(con=warehouse)
+        assert stats == {"enriched": 3, "cache": 3, "llm": 0, "fallback": 0}
+        assert llm_calls == []
+        assert _enrichment(warehouse) == enriched
+
+    def test_repeat_of_a_fallback_uses_its_own_title(self, warehouse, llm_calls, monkeypatch):
+        jobs = [("j1", "Senior Data Engineer", "Shared description"),
+                ("j2", "Junior Analyst", "Shared description")]
+        _insert_jobs(warehouse, jobs)
+        monkeypatch.setattr(ai_extract, "_call_ollama", lambda postings: [None] * len(postings))
+
+        stats = ai_extract.run_ai_enrichment(con=warehouse)
+        assert stats == {"enriched": 2, "cache": 0, "llm": 0, "fallback": 2}
+        expected = {}
+        for j_id, title, description in jobs:
+            result = _fallback_extract(title, description)
+            expected[j_id] = (result["seniority"], result["role_family"], sorted(result["skills"]))
+        assert _enrichment(warehouse) == expected
+        assert expected["j1"] != expected["j2"]
+
+    def test_cache_hits_without_llm(self, warehouse, llm_calls, monkeypatch):
+        _insert_jobs(warehouse, self.JOBS)
+        ai_extract.run_ai_enrichment(con=warehouse)
+
+        # LLM off: cached jobs still come from the cache, the rest via SQL fallback
+        warehouse.execute("DELETE FROM bridge_job_skill")
+        warehouse.execute("""
+            DELETE FROM ai_extraction_cache
+            WHERE description_hash = (SELECT description_hash FROM fact_job_posting WHERE job_id = 'j3')
+        """)
+        monkeypatch.setattr(ai_extract, "USE_OLLAMA", False)
+        llm_calls.clear()
+        stats = ai_extract.run_ai_enrichment(con=warehouse)
+        assert stats == {"enriched": 3, "cache": 2, "llm": 0, "fallback": 1}
+        assert llm_calls == []
+
+        fallback = _fallback_extract("Analyst", "Something else entirely")
+        assert _enrichment(warehouse)["j3"] == (
+            fallback["seniority"], fallback["role_family"], sorted(fallback["skills"]),
+        )
+
+
+class TestEnrichmentWriteFailure:
+    def test_failed_write_cancels_queued_chunks(self, warehouse, monkeypatch):
+        jobs = [(f"j{i}", "Engineer", f"Description {i}") for i in range(20)]
+        _insert_jobs(warehouse, jobs)
+
+        failed = threading.Event()
+        calls = []
+
+        def fake_call(postings):
+            calls.append(len(postings))
+            if len(calls) > 1:
+                # Hold later chunks until the write has failed, so the test
+                # sees whether the still-queued ones get cancelled
+                failed.wait(timeout=5)
+                time.sleep(0.05)
+            return [None] * len(postings)
+
+        def failing_write(con, batch, cache_rows):
+            failed.set()
+            raise RuntimeError("disk full")
+
+        monkeypatch.setattr(ai_extract, "USE_OLLAMA", True)
+        monkeypatch.setattr(ai_extract, "OLLAMA_WORKERS", 2)
+        monkeypatch.setattr(ai_extract, "OLLAMA_BATCH_SIZE", 1)
+        monkeypatch.setattr(ai_extract, "WRITE_BATCH_SIZE", 1)
+        monkeypatch.setattr(ai_extract, "_ping_ollama", lambda: True)
+        monkeypatch.setattr(ai_extract, "_call_ollama", fake_call)
+        monkeypatch.setattr(ai_extract, "_write_batch", failing_write)
+
+        with pytest.raises(RuntimeError, match="disk full"):
+            ai_extract.run_ai_enrichment(con=warehouse)
+        # The first chunk plus at most one already running per worker
+        assert len(calls) <= 1 + 2
+
+
+class TestMarts:
+    SENIOR = role_id("data_engineering", "senior")
+    UNKNOWN = role_id("unknown", "unknown")
+    # (job_id, title, company_id, role_id, posted_date, inserted_at)
+    JOBS = [
+        ("j1", "DE 1", "c1", SENIOR, dt.date(2024, 6, 15), dt.datetime(2024, 6, 15, 9)),
+        ("j2", "Other", "c1", UNKNOWN, dt.date(2024, 6, 15), dt.datetime(2024, 6, 15, 10)),
+        ("j3", "DE 2", "c2", SENIOR, dt.date(2024, 6, 16), dt.datetime(2024, 6, 16, 9)),
+        ("j4", "Undated", "c1", UNKNOWN, None, dt.datetime(2024, 6, 16, 10)),
+    ]
+    SKILLS = [("j1", "python"), ("j1", "sql"), ("j2", "python"), ("j3", "python"), ("j3", ""), ("j4", "sql")]
+
+    @pytest.fixture
+    def loaded(self, warehouse):
+        con = warehouse
+        con.executemany("INSERT INTO dim_company VALUES (?, ?)", [("c1", "Acme"), ("c2", "Beta")])
+        con.executemany("INSERT INTO dim_role VALUES (?, ?, ?)", [
+            (self.SENIOR, "data_engineering", "senior"), (self.UNKNOWN, "unknown", "unknown"),
+        ])
+        con.executemany(
+            """
+            INSERT INTO fact_job_posting (job_id, title, company_id, role_id, posted_date, inserted_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            self.JOBS,
+        )
+        con.executemany("INSERT INTO bridge_job_skill VALUES (?, ?)", self.SKILLS)
+        return con
+
+    def test_bridge_rejects_duplicate_skill(self, loaded):
+        loaded.execute("INSERT OR IGNORE INTO bridge_job_skill VALUES ('j1', 'python')")
+        with pytest.raises(duckdb.ConstraintException):
+            loaded.execute("INSERT INTO bridge_job_skill VALUES ('j1', 'python')")
+        assert loaded.execute(
+            "SELECT COUNT(*) FROM bridge_job_skill WHERE job_id = 'j1' AND skill = 'python'"
+        ).fetchone()[0] == 1
+
+    def test_mart_rows(self, loaded):
+        assert build_marts(con=loaded) == {
+            "mart_top_skills_daily":   4,
+            "mart_skill_by_seniority": 2,
+            "mart_top_companies":      2,
+            "mart_latest_jobs":        4,
+        }
+        today = loaded.execute("SELECT CURRENT_DATE").fetchone()[0]
+        assert sorted(loaded.execute("SELECT * FROM mart_top_skills_daily").fetchall()) == sorted([
+            (dt.date(2024, 6, 15), "python", 2),
+            (dt.date(2024, 6, 15), "sql", 1),
+            (dt.date(2024, 6, 16), "python", 1),
+            (today, "sql", 1),
+        ])
+        assert sorted(loaded.execute("SELECT * FROM mart_skill_by_seniority").fetchall()) == [
+            ("senior", "python", 2), ("senior", "sql", 1),
+        ]
+        assert loaded.execute("SELECT * FROM mart_top_companies").fetchall() == [("Acme", 3), ("Beta", 1)]
+        # Newest posting first, undated last, inserted_at breaks ties
+        assert [r[0] for r in loaded.execute("SELECT title FROM mart_latest_jobs").fetchall()] == [
+            "DE 2", "Other", "DE 1", "Undated",
+        ]
+
+    def test_export_round_trips(self, loaded, tmp_path):
+        build_marts(con=loaded)
+        stats = export_marts(str(tmp_path / "assets"), con=loaded)
+        assert stats == {"skills.parquet": 4, "seniority.parquet": 2,
+                         "companies.parquet": 2, "jobs.parquet": 4}
+
+        for mart, filename in [("mart_top_skills_daily", "skills.parquet"),
+                               ("mart_skill_by_seniority", "seniority.parquet"),
+                               ("mart_top_companies", "companies.parquet"),
+                               ("mart_latest_jobs", "jobs.parquet")]:
+            exported = loaded.execute(
+                "SELECT * FROM read_parquet(?)", [str(tmp_path / "assets" / filename)]
+            ).fetchall()
+            expected = loaded.execute(f"SELECT * FROM {mart}").fetchall()
+            assert sorted(exported, key=repr) == sorted(expected, key=repr)